@@ -7,29 +7,162 @@ Uses India Standard Time (IST, GMT+5:30)
 import pandas as pd
 import json
 import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
-from datetime import datetime
-import pytz
+import ssl
+from email.message import EmailMessage
+from datetime import datetime, timedelta
+from dateutil import parser as date_parser
+from zoneinfo import ZoneInfo
 import os
+import re
 import logging
+from logging.handlers import MemoryHandler
 from pathlib import Path
+import sys
 import time
+import queue
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from jinja2 import Environment, FileSystemLoader, TemplateNotFound
+
+# Prefer the Rust-based calamine reader (pandas 2.2+), fall back to openpyxl if it's
+# not installed or pandas is too old to know the engine
+try:
+    import python_calamine  # noqa: F401
+    PANDAS_HAS_CALAMINE = tuple(int(part) for part in pd.__version__.split('.')[:2]) >= (2, 2)
+    EXCEL_ENGINE = 'calamine' if PANDAS_HAS_CALAMINE else 'openpyxl'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
 
 # Set up IST timezone
-IST = pytz.timezone("Asia/Kolkata")
+IST = ZoneInfo("Asia/Kolkata")
+IST_OFFSET_SECONDS = 5 * 3600 + 30 * 60  # GMT+5:30, IST has no daylight saving
+
+# Implicit-TLS SMTP port; every other port uses STARTTLS
+SMTP_SSL_PORT = 465
+
+# Excel date columns and the pre-parsed columns added by load_employee_data
+DATE_COLUMNS = {
+    'Date of Birth': '_dob',
+    'Date of Joining': '_doj',
+    'Marriage Anniversary': '_dom',
+}
+
+# Full-date string formats tried (in order) by parse_date_column
+DATE_FORMATS = ['%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d', '%d.%m.%Y']
+
+# Dates starting with a 4-digit year are parsed year-first, everything else day-first
+YEAR_FIRST = re.compile(r'\d{4}\b')
+
+# Two dateutil defaults differing in day, month and year, to detect incomplete dates
+PARSE_DEFAULTS = (datetime(2000, 1, 1), datetime(2001, 2, 2))
+
+# Body of a rendered template, and where later greetings are appended when combined
+HTML_BODY = re.compile(r'<body[^>]*>(.*)</body>', re.IGNORECASE | re.DOTALL)
+HTML_BODY_END = re.compile(r'</body>', re.IGNORECASE)
+
+# Only these columns are read from the Excel file
+EMPLOYEE_COLUMNS = {'Employee Name', 'Email', *DATE_COLUMNS}
+
+# Greeting events: (event type, parsed date column, template file, template variable
+# for the years count, subject, log message when detected)
+EVENTS = [
+    ('birthday', '_dob', 'birthday.html', 'age',
+     "🎉 Happy Birthday, {name}!",
+     "🎂 Birthday detected: {name} (Age: {years})"),
+    ('work_anniversary', '_doj', 'work_anniversary.html', 'years',
+     "🌟 Happy {years} Year Work Anniversary, {name}!",
+     "🎊 Work Anniversary detected: {name} ({years} years)"),
+    ('marriage_anniversary', '_dom', 'marriage_anniversary.html', 'years',
+     "💕 Happy {years} Year Marriage Anniversary, {name}!",
+     "💑 Marriage Anniversary detected: {name} ({years} years)"),
+]
+
+class BufferedFileHandler(MemoryHandler):
+    """MemoryHandler that writes its buffer to the target file in a single write"""
+    
+    def flush(self):
+        """Write all buffered records with one write() and one flush()"""
+        with self.lock:
+            if not self.buffer or self.target is None:
+                return
+            try:
+                self.target.stream.write(''.join(
+                    self.format(record) + self.target.terminator for record in self.buffer
+                ))
+                self.target.stream.flush()
+            except Exception:
+                self.handleError(self.buffer[-1])
+            self.buffer.clear()
+    
+    def close(self):
+        """Flush and close the target file (MemoryHandler only drops its reference)"""
+        target = self.target
+        super().close()
+        if target is not None:
+            target.close()
+
 
 class HREmailAutomation:
     def __init__(self, config_path="config.json"):
         """Initialize the HR Email Automation system"""       
         self.config = self.load_config(config_path)
+        self.start_day()
+        self.templates = self.load_email_templates()
+        self.sent_lock = threading.Lock()  # Guards email_sent_today updates from sender threads
+        self.smtp_pool = None  # Queue of SMTP connection slots shared by sender threads
+        self.smtp_login_failed = threading.Event()  # Set once a login is rejected, stops further attempts
+        
+        # Email settings, read once instead of per message
+        email_config = self.config['email']
+        self.sender_email = email_config['sender_email']
+        self.password = email_config['password']
+        self.smtp_server = self.get_smtp_server(email_config)
+        self.ssl_context = ssl.create_default_context()
+        self.pool_size = max(1, int(email_config.get('pool_size', 4)))
+        self.messages_per_connection = max(1, int(email_config.get('messages_per_connection', 100)))
+        
+        self.target_hour = 16
+        self.target_minute = 49
+        self.last_run_date = None  # IST date of the last scheduled run (long-running mode)
+        
+    def start_day(self):
+        """Reset the per-day state (date, duplicate tracking, log file) for a new day"""
         self.now = datetime.now(IST)
         self.today = self.now.date()
+        # Today's date parts, bound once for the date comparisons
+        self.today_day, self.today_month, self.today_year = self.today.day, self.today.month, self.today.year
         self.setup_logging()
-        self.email_sent_today = set()  # Track (email, event_type) to allow multiple events per day
-        self.target_hour = 16
-        self.target_minute = 49
         
+        # Track (email, event_type) to allow multiple events per day; persisted so a
+        # restart on the same day doesn't resend
+        log_dir = Path(self.config.get('log_directory', 'logs'))
+        self.sent_log_path = log_dir / f"sent_{self.today.strftime('%Y-%m-%d')}.txt"
+        self.email_sent_today = self.load_sent_today()
+    
+    def load_sent_today(self):
+        """Load today's already-sent (email, event_type) keys from the sent log"""
+        try:
+            with open(self.sent_log_path, 'r', encoding='utf-8') as f:
+                sent = {tuple(line.rstrip('\n').split('\t', 1)) for line in f if '\t' in line}
+        except FileNotFoundError:
+            return set()
+        self.logger.info(f"Loaded {len(sent)} emails already sent today from {self.sent_log_path}")
+        return sent
+    
+    def record_sent(self, email_event_keys):
+        """Append sent (email, event_type) keys to today's sent log"""
+        data = ''.join(f"{email}\t{event_type}\n" for email, event_type in email_event_keys)
+        try:
+            # O_APPEND keeps each write whole even with several sender threads
+            fd = os.open(self.sent_log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data.encode('utf-8'))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            self.logger.warning(f"Could not record sent email in {self.sent_log_path}: {str(e)}")
+    
     def load_config(self, config_path):
         """Load configuration from JSON file"""
         try:
@@ -51,17 +184,26 @@ class HREmailAutomation:
         log_filename = f"{self.today.strftime('%Y-%m-%d')}_IST.log"
         log_path = log_dir / log_filename
         
+        # Buffer file writes; flushed at the end of each run or on any error
+        self.log_buffer = BufferedFileHandler(
+            1024,
+            flushLevel=logging.ERROR,
+            target=logging.FileHandler(log_path, encoding='utf-8')
+        )
+        
+        # force=True swaps in the new day's log file when running continuously
         logging.basicConfig(
             level=logging.INFO,
             format='%(asctime)s [IST] - %(levelname)s - %(message)s',
             handlers=[
-                logging.FileHandler(log_path, encoding='utf-8'),
+                self.log_buffer,
                 logging.StreamHandler()
-            ]
+            ],
+            force=True
         )
         
-        # Set IST for logging timestamps
-        logging.Formatter.converter = lambda *args: datetime.now(IST).timetuple()
+        # Set IST for logging timestamps (fixed offset, so no timezone lookup per record)
+        logging.Formatter.converter = staticmethod(lambda secs: time.gmtime(secs + IST_OFFSET_SECONDS))
         
         self.logger = logging.getLogger(__name__)
         self.logger.info(f"=== HR Email Automation Started (IST: {datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S')}) ===")
@@ -71,15 +213,62 @@ class HREmailAutomation:
         excel_path = self.config.get('excel_file_path', 'data/employees.xlsx')
         
         try:
-            df = pd.read_excel(excel_path)
+            df = pd.read_excel(
+                excel_path,
+                engine=EXCEL_ENGINE,
+                usecols=lambda column: column in EMPLOYEE_COLUMNS,
+                dtype={'Employee Name': str, 'Email': str}
+            )
             self.logger.info(f"Loaded {len(df)} employees from {excel_path}")
-            return df
         except FileNotFoundError:
             self.logger.error(f"Excel file not found: {excel_path}")
             raise
         except Exception as e:
             self.logger.error(f"Error reading Excel file: {str(e)}")
             raise
+        
+        # Drop employees without a usable email address once, up front
+        has_email = df['Email'].notna() & df['Email'].astype(str).str.contains('@', regex=False)
+        if not has_email.all():
+            self.logger.warning(f"Skipped {(~has_email).sum()} employees: No email address")
+            df = df[has_email]
+        
+        # Parse every date column once up front (vectorized) instead of per row
+        for column, parsed_column in DATE_COLUMNS.items():
+            df[parsed_column] = self.parse_date_column(df, column)
+        return df
+    
+    def parse_date_column(self, df, column):
+        """Parse a whole date column, falling back to parse_date for odd formats"""
+        if column not in df:
+            return pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            # Real Excel date cells, nothing to parse
+            return values
+        
+        # Try each full-date format as one vectorized pass over the rows still unparsed.
+        # Explicit formats avoid pandas inferring a partial format like '%Y' from one cell.
+        text = values.astype(str).str.strip()
+        parsed = pd.Series(pd.NaT, index=df.index, dtype='datetime64[ns]')
+        for fmt in DATE_FORMATS:
+            missing = parsed.isna()
+            if not missing.any():
+                break
+            parsed[missing] = pd.to_datetime(text[missing], format=fmt, errors='coerce')
+        
+        # Values no format matched (e.g. datetime cells mixed with text, '5 March 1990')
+        unparsed = parsed.isna() & values.notna()
+        if unparsed.any():
+            parsed[unparsed] = pd.to_datetime(
+                df.loc[unparsed, column].map(self.parse_date), errors='coerce'
+            )
+        return parsed
+    
+    def date_mask(self, dates):
+        """Boolean mask of rows whose date falls on today's day and month"""
+        return (dates.dt.month == self.today_month) & (dates.dt.day == self.today_day)
     
     def parse_date(self, date_value):
         """Parse date from Excel (handles various formats)"""
@@ -89,174 +278,261 @@ class HREmailAutomation:
             # If already a datetime object
             if isinstance(date_value, datetime):
                 return date_value.date()
-            # Try parsing string dates (DD-MM-YYYY, DD/MM/YYYY, etc.)
-            date_formats = ['%d-%m-%Y', '%d/%m/%Y', '%Y-%m-%d', '%d.%m.%Y']
-            for fmt in date_formats:
-                try:
-                    return datetime.strptime(str(date_value), fmt).date()
-                except ValueError:
-                    continue
-            
-            # If all format fail then 
-            return None
+            # Parse string dates (DD-MM-YYYY, DD/MM/YYYY, YYYY-MM-DD, etc.) with dateutil,
+            # day-first unless the string starts with the year (ISO). Only the values
+            # parse_date_column's format passes couldn't handle get here.
+            text = str(date_value).strip()
+            year_first = YEAR_FIRST.match(text) is not None
+            parsed = [
+                date_parser.parse(text, dayfirst=not year_first, yearfirst=year_first, default=default)
+                for default in PARSE_DEFAULTS
+            ]
+            # Parsed twice on purpose: dateutil silently fills missing parts from
+            # `default`, so differing results mean the day, month or year wasn't in
+            # the value (e.g. '1990', 'Oct 1985')
+            if parsed[0] != parsed[1]:
+                self.logger.warning(f"Could not parse date: {date_value} - incomplete date")
+                return None
+            return parsed[0].date()
         except Exception as e:
             self.logger.warning(f"Could not parse date: {date_value} - {str(e)}")
             return None
     
-    def load_email_template(self, template_name):
-        """Load HTML email template"""
-        template_path = Path(self.config.get('template_directory', 'templates')) / template_name
+    def load_email_templates(self):
+        """Load and compile all HTML email templates once"""
+        template_dir = self.config.get('template_directory', 'templates')
+        env = Environment(loader=FileSystemLoader(template_dir), autoescape=True)
         
+        templates = {}
+        for event_type, _, template_name, *_ in EVENTS:
+            try:
+                templates[event_type] = env.get_template(template_name)
+            except TemplateNotFound:
+                self.logger.error(f"Template not found: {Path(template_dir) / template_name}")
+                raise
+        return templates
+    
+    def get_smtp_server(self, email_config):
+        """Resolve the (host, port) of the SMTP server for the configured provider"""
+        # this feature use to connect smtp google gmail server and send email 
+        if email_config['provider'] == 'gmail':
+            return 'smtp.gmail.com', 465
+        elif email_config['provider'] == 'outlook':
+            # Office 365 only accepts STARTTLS on 587, not SSL on 465
+            return 'smtp.office365.com', 587
+        else:
+            # Custom SMTP
+            return email_config['smtp_host'], email_config['smtp_port']
+    
+    def _open_smtp(self):
+        """Open and authenticate a new SMTP connection"""
+        host, port = self.smtp_server
+        if port == SMTP_SSL_PORT:
+            # TLS from the first packet, saves the EHLO/STARTTLS round trip
+            server = smtplib.SMTP_SSL(host, port, context=self.ssl_context)
+        else:
+            server = smtplib.SMTP(host, port)
+            server.ehlo()
+            server.starttls(context=self.ssl_context)
+            server.ehlo()
+        server.login(self.sender_email, self.password)
+        return server
+    
+    def _recycle_smtp(self, server):
+        """Close a connection that has reached messages_per_connection"""
         try:
-            with open(template_path, 'r', encoding='utf-8') as f:
-                return f.read()
-        except FileNotFoundError:
-            self.logger.error(f"Template not found: {template_path}")
-            raise
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        # Reopened lazily by the next send_email that takes this pool slot
+        return None
     
-    def send_email(self, recipient_email, subject, html_content, event_type, max_retries=3):
-        """Send email with retry logic"""
-        email_event_key = (recipient_email, event_type)
-        if email_event_key in self.email_sent_today:
-            self.logger.warning(f"Duplicate email prevented for {recipient_email} - {event_type}")
+    def _open_smtp_pool(self, size):
+        """Create `size` pool slots to be shared by the sender threads"""
+        # Pool entries are (connection, messages sent on it) so each can be recycled.
+        # Connections are opened lazily in send_email, so a failed connect is retried
+        # with the same backoff as a failed send instead of aborting the run.
+        self.smtp_pool = queue.Queue()
+        for _ in range(size):
+            self.smtp_pool.put((None, 0))
+        self.smtp_login_failed.clear()
+        self.logger.info(f"SMTP connection pool ready ({size} slots, connections open on first use)")
+    
+    def _close_smtp_pool(self):
+        """Quit every pooled SMTP connection"""
+        if self.smtp_pool is None:
+            return
+        while not self.smtp_pool.empty():
+            server, _ = self.smtp_pool.get_nowait()
+            if server is None:
+                continue
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError) as e:
+                self.logger.warning(f"Error closing SMTP connection: {str(e)}")
+        self.smtp_pool = None
+    
+    def _is_retriable(self, error):
+        """Whether a send error is temporary (worth retrying) or permanent"""
+        if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+            return True
+        if isinstance(error, smtplib.SMTPRecipientsRefused):
             return False
+        if isinstance(error, smtplib.SMTPResponseException):
+            # 4xx replies (e.g. 421, 451) are temporary, 5xx are permanent
+            return 400 <= error.smtp_code < 500
+        if isinstance(error, smtplib.SMTPException):
+            return False
+        # Network errors (refused, reset, timeout); anything else is a bug, not worth retrying
+        return isinstance(error, OSError)
+    
+    def send_email(self, recipient_email, subject, html_content, event_types, max_retries=3):
+        """Send email with retry logic"""
+        # Duplicates were already dropped by collect_greetings
+        email_event_keys = [(recipient_email, event_type) for event_type in event_types]
+        
+        # Built once, outside the retry loop
+        msg = EmailMessage()
+        msg['From'] = self.sender_email
+        msg['To'] = recipient_email
+        msg['Subject'] = subject
+        msg.set_content(html_content, subtype='html')
         
         for attempt in range(1, max_retries + 1):
+            # Bad credentials won't fix themselves; don't let every queued email retry the login
+            if self.smtp_login_failed.is_set():
+                self.logger.error(f"✗ Skipped email to {recipient_email}: SMTP login failed")
+                return False
+            
             try:
-                msg = MIMEMultipart('alternative')
-                msg['From'] = self.config['email']['sender_email']
-                msg['To'] = recipient_email
-                msg['Subject'] = subject
-                
-                html_part = MIMEText(html_content, 'html')
-                msg.attach(html_part)
-                
-                # this feature use to connect smtp google gmail server and send email 
-                if self.config['email']['provider'] == 'gmail':
-                    server = smtplib.SMTP('smtp.gmail.com', 587)
-                elif self.config['email']['provider'] == 'outlook':
-                    server = smtplib.SMTP('smtp.office365.com', 587)
-                else:
-                    # Custom SMTP
-                    server = smtplib.SMTP(
-                        self.config['email']['smtp_host'],
-                        self.config['email']['smtp_port']
-                    )
-                
-                server.starttls()
-                server.login(
-                    self.config['email']['sender_email'],
-                    self.config['email']['password']
-                 
-                
-                server.send_message(msg)
-                server.quit()
+                server, messages_sent = self.smtp_pool.get()
+                try:
+                    if server is None:
+                        server, messages_sent = self._open_smtp(), 0
+                    try:
+                        server.send_message(msg)
+                    except smtplib.SMTPServerDisconnected:
+                        # Server dropped the idle connection - reconnect once and resend
+                        self.logger.warning("SMTP connection lost, reconnecting...")
+                        server, messages_sent = self._open_smtp(), 0
+                        server.send_message(msg)
+                    
+                    # Recycle the connection before the provider's per-connection limit kicks in
+                    messages_sent += 1
+                    if messages_sent >= self.messages_per_connection:
+                        self.logger.info(f"Recycling SMTP connection after {messages_sent} messages")
+                        server, messages_sent = self._recycle_smtp(server), 0
+                finally:
+                    self.smtp_pool.put((server, messages_sent))
                 
-                self.email_sent_today.add(email_event_key)
+                with self.sent_lock:
+                    self.email_sent_today.update(email_event_keys)
+                self.record_sent(email_event_keys)
                 self.logger.info(f"✓ Email sent successfully to {recipient_email} - {subject}")
                 return True
                 
             except Exception as e:
+                if isinstance(e, smtplib.SMTPAuthenticationError):
+                    self.smtp_login_failed.set()
+                if not self._is_retriable(e):
+                    self.logger.error(f"✗ Failed to send email to {recipient_email} (not retrying): {str(e)}")
+                    return False
+                
                 self.logger.warning(f"Attempt {attempt}/{max_retries} failed for {recipient_email}: {str(e)}")
                 if attempt < max_retries:
-                    time.sleep(2)  # Wait before retry
+                    # Exponential backoff with jitter so throttled retries don't arrive together
+                    time.sleep(min(30, 2 ** (attempt - 1)) * (0.5 + random.random()))
                 else:
                     self.logger.error(f"✗ Failed to send email to {recipient_email} after {max_retries} attempts")
                     return False
     
-    def check_birthday(self, row):
-        """Check if today is employee's birthday"""
-        dob = self.parse_date(row.get('Date of Birth'))
-        
-        if not dob:
-            return False
-        
-        if self.today.day == dob.day and self.today.month == dob.month:
-            name = row.get('Employee Name', 'Employee')
-            email = row.get('Email')
-            
-            if not email or pd.isna(email):
-                self.logger.warning(f"Skipped birthday for {name}: No email address")
-                return False
-            
-            age = self.today.year - dob.year
-            self.logger.info(f"🎂 Birthday detected: {name} (Age: {age})")
-            
-            # Load and personalize template 
-            template = self.load_email_template('birthday.html')
-            html_content = template.replace('{{name}}', name).replace('{{age}}', str(age))
+    def combine_html(self, html_parts):
+        """Merge rendered HTML documents into one, appending each later body to the first"""
+        combined = html_parts[0]
+        for html_content in html_parts[1:]:
+            body = HTML_BODY.search(html_content)
+            extra = body.group(1) if body else html_content
+            end = HTML_BODY_END.search(combined)
+            if end:
+                combined = combined[:end.start()] + extra + combined[end.start():]
+            else:
+                combined += extra
+        return combined
+    
+    def render_greeting(self, name, email, events):
+        """Render the (email, subject, html_content, event_types) for an employee's events today"""
+        event_types = [event[0] for event, _ in events]
+        subjects = []
+        html_parts = []
+        for (event_type, _, _, variable, subject_format, detected_format), years in events:
+            self.logger.info(detected_format.format(name=name, years=years))
             
-            subject = f"🎉 Happy Birthday, {name}!"
-            return self.send_email(email, subject, html_content, 'birthday')
+            # Personalize pre-compiled template
+            html_parts.append(self.templates[event_type].render(name=name, **{variable: years}))
+            subjects.append(subject_format.format(name=name, years=years))
         
-        return False
+        # Events falling on the same day go out as a single HTML email
+        return email, ' & '.join(subjects), self.combine_html(html_parts), event_types
     
-    def check_work_anniversary(self, row):
-        """Check if today is employee's work anniversary"""
-        doj = self.parse_date(row.get('Date of Joining'))
-
-        if not doj:
-            return False
-
-        if self.today.month == doj.month and self.today.day == doj.day:
-            years_completed = self.today.year - doj.year
-
-            name = row.get('Employee Name', 'Employee')
-            email = row.get('Email')
-
-            if not email or pd.isna(email):
-                self.logger.warning(f"Skipped work anniversary for {name}: No email address")
-                return False
-
-            self.logger.info(f"🎊 Work Anniversary detected: {name} ({years_completed} years)")
-
-            # Load and personalize template
-            template = self.load_email_template('work_anniversary.html')
-            html_content = (template
-                          .replace('{{name}}', name)
-                          .replace('{{years}}', str(years_completed)))
-
-            subject = f"🌟 Happy {years_completed} Year Work Anniversary, {name}!"
-            return self.send_email(email, subject, html_content, 'work_anniversary')
-
-        return False
+    def event_rows(self, df, parsed_column):
+        """Employees whose date falls on today, as (name, email, years) columns"""
+        dates = df[parsed_column]
+        mask = self.date_mask(dates)
+        return pd.DataFrame({
+            'name': df.loc[mask, 'Employee Name'],
+            'email': df.loc[mask, 'Email'],
+            'years': self.today_year - dates[mask].dt.year,
+        })
     
-    def check_marriage_anniversary(self, row):
-        """Check if today is employee's marriage anniversary"""
-        marriage_date = self.parse_date(row.get('Marriage Anniversary'))
-
-        if not marriage_date:
-            return False
-
-        if self.today.day == marriage_date.day and self.today.month == marriage_date.month:
-            years_completed = self.today.year - marriage_date.year
-
-            name = row.get('Employee Name', 'Employee')
-            email = row.get('Email')
-
-            if not email or pd.isna(email):
-                self.logger.warning(f"Skipped marriage anniversary for {name}: No email address")
-                return False
-
-            self.logger.info(f"💑 Marriage Anniversary detected: {name} ({years_completed} years)")
-
-            # Load and personalize template
-            template = self.load_email_template('marriage_anniversary.html')
-            html_content = (template
-                          .replace('{{name}}', name)
-                          .replace('{{years}}', str(years_completed)))
-
-            subject = f"💕 Happy {years_completed} Year Marriage Anniversary, {name}!"
-            return self.send_email(email, subject, html_content, 'marriage_anniversary')
-
-        return False
+    def collect_greetings(self, df):
+        """Group today's unsent events by employee: {(name, email): [(event, years), ...]}"""
+        greetings = {}
+        due = set(self.email_sent_today)
+        for event in EVENTS:
+            rows = self.event_rows(df, event[1])
+            for name, email, years in rows.itertuples(index=False, name=None):
+                # Skip events already sent today or repeated in the sheet
+                if (email, event[0]) in due:
+                    self.logger.warning(f"Duplicate email prevented for {email} - {event[0]}")
+                    continue
+                due.add((email, event[0]))
+                greetings.setdefault((name, email), []).append((event, years))
+        return greetings
+    
+    def seconds_until_next_run(self):
+        """Seconds to sleep until the next target_hour:target_minute IST"""
+        now = datetime.now(IST)
+        target = now.replace(hour=self.target_hour, minute=self.target_minute, second=0, microsecond=0)
+        
+        # Still inside today's target minute counts as due, unless we already ran today
+        if target + timedelta(minutes=1) <= now or target.date() == self.last_run_date:
+            target += timedelta(days=1)
+        return max(0.0, (target - now).total_seconds())
+    
+    def run_forever(self):
+        """Stay resident and run once a day at the target time"""
+        while True:
+            delay = self.seconds_until_next_run()
+            self.logger.info(f"Next run at {self.target_hour:02d}:{self.target_minute:02d} IST (in {delay / 3600:.1f} hours)")
+            self.log_buffer.flush()
+            time.sleep(delay)
+            
+            self.start_day()
+            self.last_run_date = self.today
+            try:
+                # Already waited for the target time; a late wake-up (suspend, clock
+                # change, load) must still send today's emails
+                self.run(check_time=False)
+            except Exception:
+                # Already logged by run(); keep the scheduler alive for tomorrow
+                pass
     
-    def run(self):
-        """Main execution method"""
+    def run(self, check_time=True):
+        """Main execution method (check_time=False runs regardless of the clock)"""
         try:
             # Check if current time is 16:48AM IST (with 1-minute tolerance)s
             current_time = datetime.now(IST)
-            if current_time.hour != self.target_hour or current_time.minute != self.target_minute:
+            if check_time and (current_time.hour != self.target_hour or current_time.minute != self.target_minute):
                 self.logger.info(f"Not scheduled time. Current time: {current_time.strftime('%H:%M')} IST. Target time: {self.target_hour:02d}:{self.target_minute:02d} IST")
                 self.logger.info("Emails will only be sent at 16:49PM IST")
                 return
@@ -264,42 +540,65 @@ class HREmailAutomation:
             self.logger.info(f"Scheduled time reached: {current_time.strftime('%H:%M')} IST - Processing emails...")
             
             df = self.load_employee_data()
-            birthday_count = 0
-            work_anniversary_count = 0
-            marriage_anniversary_count = 0           
-            for index, row in df.iterrows():
+            sent_counts = {event[0]: 0 for event in EVENTS}
+            emails_sent = 0  # Can be lower than the sum of sent_counts when events share an email
+            
+            # Only employees with an event today are visited, once each
+            greetings = self.collect_greetings(df)
+            self.logger.info(f"{len(greetings)} employees have greetings due today")
+            
+            # Render every email up front so the sender threads only do network I/O
+            outbox = []
+            for (name, email), events in greetings.items():
                 try:
-                    # Check each type of greeting
-                    if self.check_birthday(row):
-                        birthday_count += 1
-                    
-                    if self.check_work_anniversary(row):
-                        work_anniversary_count += 1
-                    
-                    if self.check_marriage_anniversary(row):
-                        marriage_anniversary_count += 1
-                        
+                    outbox.append((name, self.render_greeting(name, email, events)))
                 except Exception as e:
-                    name = row.get('Employee Name', f'Row {index}')
                     self.logger.error(f"Error processing employee {name}: {str(e)}")
             
+            # Each worker thread borrows a pooled connection per send
+            pool_size = min(self.pool_size, len(outbox))
+            if pool_size:
+                try:
+                    self._open_smtp_pool(pool_size)
+                    with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                        futures = [
+                            (name, event_types, executor.submit(self.send_email, email, subject, html_content, event_types))
+                            for name, (email, subject, html_content, event_types) in outbox
+                        ]
+                    for name, event_types, future in futures:
+                        try:
+                            if future.result():
+                                emails_sent += 1
+                                for event_type in event_types:
+                                    sent_counts[event_type] += 1
+                        except Exception as e:
+                            self.logger.error(f"Error processing employee {name}: {str(e)}")
+                finally:
+                    self._close_smtp_pool()
+            
             # Summary
             self.logger.info("=== Summary ===")
-            self.logger.info(f"Birthday emails sent: {birthday_count}")
-            self.logger.info(f"Work anniversary emails sent: {work_anniversary_count}")
-            self.logger.info(f"Marriage anniversary emails sent: {marriage_anniversary_count}")
-            self.logger.info(f"Total emails sent: {birthday_count + work_anniversary_count + marriage_anniversary_count}")
+            for event_type, count in sent_counts.items():
+                self.logger.info(f"{event_type.replace('_', ' ').capitalize()} emails sent: {count}")
+            self.logger.info(f"Total emails sent: {emails_sent}")
             self.logger.info(f"=== HR Email Automation Completed (IST: {datetime.now(IST).strftime('%Y-%m-%d %H:%M:%S')}) ===")
             
         except Exception as e:
             self.logger.error(f"Critical error in main execution: {str(e)}")
             raise
+        finally:
+            self.log_buffer.flush()
 
 
 if __name__ == "__main__":
     try:
         automation = HREmailAutomation()
-        automation.run()
+        if '--daemon' in sys.argv:
+            # Stay resident and send every day at the target time
+            automation.run_forever()
+        else:
+            # Single check, for cron / Task Scheduler
+            automation.run()
     except Exception as e:
         print(f"Failed to run HR Email Automation: {str(e)}")
         exit(1)
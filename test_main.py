@@ -0,0 +1,188 @@
+"""Tests for HR Email Automation"""
+
+import json
+import logging
+import smtplib
+from datetime import date, datetime
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from main import DATE_COLUMNS, HREmailAutomation
+
+
+@pytest.fixture
+def automation(tmp_path, monkeypatch):
+    """HREmailAutomation with a throwaway config, templates and log directory"""
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    for template_name in ("birthday.html", "work_anniversary.html", "marriage_anniversary.html"):
+        (templates / template_name).write_text("Dear {{name}}", encoding="utf-8")
+
+    config = {
+        "email": {
+            "provider": "gmail",
+            "sender_email": "hr@example.com",
+            "password": "secret",
+        },
+        "template_directory": str(templates),
+        "log_directory": str(tmp_path / "logs"),
+    }
+    config_path = tmp_path / "config.json"
+    config_path.write_text(json.dumps(config), encoding="utf-8")
+
+    monkeypatch.chdir(tmp_path)
+    return HREmailAutomation(str(config_path))
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("15-03-1990", date(1990, 3, 15)),
+    ("15/03/1990", date(1990, 3, 15)),
+    ("15.03.1990", date(1990, 3, 15)),
+    ("06-05-2020", date(2020, 5, 6)),
+    ("2020-05-06", date(2020, 5, 6)),
+    ("2020/05/06", date(2020, 5, 6)),
+    (datetime(2020, 5, 6), date(2020, 5, 6)),
+])
+def test_parse_date_formats(automation, value, expected):
+    assert automation.parse_date(value) == expected
+
+
+@pytest.mark.parametrize("value", ["1990", "Oct 1985", "15-03", "March", "not a date", None])
+def test_parse_date_rejects_incomplete_dates(automation, value):
+    assert automation.parse_date(value) is None
+
+
+def test_parse_date_column_mixed_formats(automation):
+    df = pd.DataFrame({"Date of Birth": [
+        "1990", "15-03-1990", "2020-05-06", "Oct 1985", datetime(1988, 7, 22), None,
+    ]})
+    parsed = automation.parse_date_column(df, "Date of Birth")
+    assert [None if pd.isna(value) else value.date() for value in parsed] == [
+        None, date(1990, 3, 15), date(2020, 5, 6), None, date(1988, 7, 22), None,
+    ]
+
+
+class FakeSMTP:
+    """Stands in for a logged-in smtplib connection"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    def send_message(self, msg):
+        self.sent.append(msg)
+
+    def quit(self):
+        self.closed = True
+
+
+def test_send_email_retries_failed_connect(automation, monkeypatch):
+    server = FakeSMTP()
+    connects = iter([OSError("connection refused"), server])
+
+    def open_smtp():
+        result = next(connects)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(automation, "_open_smtp", open_smtp)
+    monkeypatch.setattr("main.time.sleep", lambda seconds: None)
+
+    automation._open_smtp_pool(2)
+    assert automation.send_email("a@example.com", "Hi", "<p>Hi</p>", ["birthday"])
+    automation._close_smtp_pool()
+
+    assert len(server.sent) == 1
+    assert server.closed
+
+
+def test_send_email_stops_logging_in_after_auth_failure(automation, monkeypatch):
+    logins = []
+
+    def open_smtp():
+        logins.append(True)
+        raise smtplib.SMTPAuthenticationError(535, b"bad credentials")
+
+    monkeypatch.setattr(automation, "_open_smtp", open_smtp)
+    monkeypatch.setattr("main.time.sleep", lambda seconds: None)
+
+    automation._open_smtp_pool(2)
+    for i in range(10):
+        assert not automation.send_email(f"e{i}@example.com", "Hi", "<p>Hi</p>", ["birthday"])
+    automation._close_smtp_pool()
+
+    assert len(logins) == 1
+
+
+def test_run_without_time_check_ignores_target_minute(automation, monkeypatch):
+    now = datetime.now()
+    automation.target_hour = (now.hour + 12) % 24
+    loaded = []
+
+    def load_employee_data():
+        loaded.append(True)
+        df = pd.DataFrame(columns=["Employee Name", "Email"])
+        for parsed_column in DATE_COLUMNS.values():
+            df[parsed_column] = pd.Series(dtype="datetime64[ns]")
+        return df
+
+    monkeypatch.setattr(automation, "load_employee_data", load_employee_data)
+
+    automation.run()
+    assert not loaded
+
+    automation.run(check_time=False)
+    assert loaded
+
+
+def test_combine_html_merges_bodies_into_one_document(automation):
+    first = "<html><head><title>A</title></head><body><p>Birthday</p></body></html>"
+    second = "<html><head><title>B</title></head><BODY style='x'><p>Anniversary</p></BODY></html>"
+    combined = automation.combine_html([first, second])
+    assert combined == (
+        "<html><head><title>A</title></head><body><p>Birthday</p><p>Anniversary</p></body></html>"
+    )
+
+
+def test_log_buffer_writes_batch_once_and_closes_file(automation, monkeypatch):
+    logger = logging.getLogger("main")
+    target = automation.log_buffer.target
+    automation.log_buffer.flush()
+
+    flushes = []
+    real_flush = target.stream.flush
+
+    def counting_flush():
+        flushes.append(True)
+        real_flush()
+
+    monkeypatch.setattr(target.stream, "flush", counting_flush)
+    for i in range(50):
+        logger.info(f"record {i}")
+    automation.log_buffer.flush()
+
+    assert len(flushes) == 1
+    lines = Path(target.baseFilename).read_text(encoding="utf-8").splitlines()
+    assert lines[-1].endswith("[IST] - INFO - record 49")
+
+    automation.log_buffer.close()
+    assert target.stream is None
+
+
+@pytest.mark.parametrize("error, retriable", [
+    (smtplib.SMTPServerDisconnected("gone"), True),
+    (smtplib.SMTPConnectError(421, b"busy"), True),
+    (smtplib.SMTPDataError(451, b"try later"), True),
+    (ConnectionResetError("reset"), True),
+    (TimeoutError("timed out"), True),
+    (smtplib.SMTPDataError(554, b"rejected"), False),
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user")}), False),
+    (smtplib.SMTPNotSupportedError("no STARTTLS"), False),
+    (TypeError("bad argument"), False),
+    (UnicodeEncodeError("ascii", "é", 0, 1, "ordinal not in range"), False),
+])
+def test_is_retriable(automation, error, retriable):
+    assert automation._is_retriable(error) is retriable